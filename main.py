@@ -1,18 +1,40 @@
 import os
-import json
-import boto3
+import sys
+import gzip
+import codecs
+import random
+import asyncio
+import hashlib
+import threading
+import functools
+import botocore.session
+import orjson
 import uuid
 from datetime import datetime
-from flask import Flask, request, jsonify, render_template, session
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AsyncExitStack
+from quart import Quart, Response, request, jsonify, render_template, session
 import logging
+from botocore.config import Config
 from botocore.exceptions import ClientError, NoCredentialsError, PartialCredentialsError
 from dotenv import load_dotenv
 from time import time 
 
+try:
+    import aioboto3
+    from aiobotocore.config import AioConfig
+except ImportError:  # Fall back to the synchronous boto3 clients
+    aioboto3 = None
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
 # Load environment variables
 load_dotenv()
 
-app = Flask(__name__)
+app = Quart(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'your-secret-key-here')
 
 # Configure logging
@@ -32,18 +54,118 @@ BEDROCK_AGENT_ALIAS_ID = os.getenv('BEDROCK_AGENT_ALIAS_ID', 'V0XBFRQZUC')
 KNOWLEDGE_BASE_ID = os.getenv('KNOWLEDGE_BASE_ID', 'VVU0EDVBWU')
 DATA_SOURCE_ID = os.getenv('DATA_SOURCE_ID', 'R7GVAC04R2')
 
+# Dedicated pool for blocking Bedrock calls; the default executor caps at cpu_count() + 4
+BEDROCK_MAX_PARALLEL = int(os.getenv('BEDROCK_MAX_PARALLEL', (os.cpu_count() or 1) * 5))
+BEDROCK_EXECUTOR = ThreadPoolExecutor(max_workers=BEDROCK_MAX_PARALLEL, thread_name_prefix='bedrock')
+
+# Connection settings shared by every AWS client: keep sockets alive and
+# size the pool for (workers x concurrent queries) so calls reuse TLS connections.
+# By default it is never smaller than the executor, so no Bedrock thread waits on a socket.
+AWS_MAX_POOL_CONNECTIONS = int(os.getenv('AWS_MAX_POOL_CONNECTIONS', max(64, BEDROCK_MAX_PARALLEL)))
+AWS_CLIENT_SETTINGS = {
+    'max_pool_connections': AWS_MAX_POOL_CONNECTIONS,
+    'retries': {'mode': 'adaptive', 'max_attempts': 5},
+    'tcp_keepalive': True,
+    'connect_timeout': 3,
+    'read_timeout': 120
+}
+aws_client_config = Config(**AWS_CLIENT_SETTINGS)
+aws_async_client_config = AioConfig(**AWS_CLIENT_SETTINGS) if aioboto3 is not None else None
+
+# One botocore session for every sync client: service models and endpoint data are
+# loaded once, and boto3's resource layer (unused here) is skipped entirely
+botocore_session = botocore.session.get_session()
+
+def create_aws_client(service_name):
+    """Create a low-level client from the shared botocore session"""
+    return botocore_session.create_client(service_name, region_name=AWS_REGION, config=aws_client_config)
+
 # Global variables for AWS clients
 s3_client = None
 bedrock_agent_runtime = None
 bedrock_agent = None
+aio_session = None
+bedrock_runtime_async = None  # Long-lived aioboto3 runtime client, one per worker
+_async_client_stack = None
+_async_client_session = None  # aio_session the current async client was built from
+_async_client_lock = None
+_clients_ready = False  # Set once every client above exists, checked before each query
 aws_connection_status = False
 connection_error_message = ""
 
+# JSON responses at least this large are compressed when the client accepts it
+COMPRESS_MIMETYPES = ('application/json',)
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 512))
+
+# Bedrock sessions are reused per browser session until idle for this long
+COOKING_SESSION_TTL = int(os.getenv('COOKING_SESSION_TTL', 30 * 60))
+
+# Preflight probe results (STS, S3, Bedrock) reused for PREFLIGHT_TTL seconds
+PREFLIGHT_TTL = int(os.getenv('PREFLIGHT_TTL', 60))
+_preflight_lock = threading.Lock()
+_preflight_cache = {}  # (probe name, credentials hash) -> (timestamp, result)
+credentials_hash = None
+
+def _fresh_probe(cache_key):
+    """Return the cached (timestamp, result) entry if it is younger than PREFLIGHT_TTL"""
+    with _preflight_lock:
+        cached = _preflight_cache.get(cache_key)
+    if cached and time() - cached[0] < PREFLIGHT_TTL:
+        return cached
+    return None
+
+def cached_probe(name, probe):
+    """Run a preflight probe, reusing its result while it is younger than PREFLIGHT_TTL"""
+    cache_key = (name, credentials_hash)
+    cached = _fresh_probe(cache_key)
+    if cached:
+        return cached[1]
+    
+    # Probe outside the lock; exceptions propagate and are never cached
+    result = probe()
+    with _preflight_lock:
+        _preflight_cache[cache_key] = (time(), result)
+    return result
+
+async def cached_probe_async(name, probe):
+    """Answer fresh probes on the event loop; stale ones re-run on the Bedrock executor"""
+    cached = _fresh_probe((name, credentials_hash))
+    if cached:
+        return cached[1]
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(BEDROCK_EXECUTOR, cached_probe, name, probe)
+
+def probe_s3_bucket():
+    """Return None if the S3 bucket is reachable, otherwise the error code"""
+    try:
+        s3_client.head_bucket(Bucket=S3_BUCKET_NAME)
+        return None
+    except ClientError as e:
+        return e.response['Error']['Code']
+    except Exception as e:
+        return str(e)
+
+def probe_bedrock_agent():
+    """Return None if the Bedrock agent is reachable, otherwise the error code"""
+    try:
+        bedrock_agent.get_agent(agentId=BEDROCK_AGENT_ID)
+        return None
+    except ClientError as e:
+        return e.response['Error']['Code']
+    except Exception as e:
+        return str(e)
+
 def initialize_aws_clients():
     """Initialize AWS clients with comprehensive error handling"""
-    global s3_client, bedrock_agent_runtime, bedrock_agent, aws_connection_status, connection_error_message
+    global s3_client, bedrock_agent_runtime, bedrock_agent, aio_session, aws_connection_status, connection_error_message
+    global credentials_hash, _clients_ready, AWS_REGION, AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY
     
     try:
+        # Re-read the environment so a reinitialization picks up rotated credentials
+        AWS_REGION = os.getenv('AWS_REGION', 'us-east-1')
+        AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID')
+        AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY')
+        
         # Validate environment variables
         if not AWS_ACCESS_KEY_ID or not AWS_SECRET_ACCESS_KEY:
             error_msg = "AWS credentials not found in environment variables"
@@ -55,51 +177,49 @@ def initialize_aws_clients():
         access_key = str(AWS_ACCESS_KEY_ID).strip().strip('"').strip("'")
         secret_key = str(AWS_SECRET_ACCESS_KEY).strip().strip('"').strip("'")
         
-        logger.info(f" Creating AWS session with access key: {access_key[:8]}...")
+        # Unchanged credentials with a live connection: nothing to rebuild
+        new_credentials_hash = hashlib.blake2b(
+            '\0'.join((access_key, secret_key, AWS_REGION)).encode('utf-8'), digest_size=16
+        ).digest()
+        if new_credentials_hash == credentials_hash and aws_connection_status:
+            logger.info(" AWS credentials unchanged, reusing existing clients")
+            return True
         
-        # Create session with explicit credentials
-        session_aws = boto3.Session(
-            aws_access_key_id=access_key,
-            aws_secret_access_key=secret_key,
-            region_name=AWS_REGION
-        )
+        logger.info(" Creating AWS session with access key: %.8s...", access_key)
+        
+        # Set explicit credentials on the shared botocore session
+        botocore_session.set_credentials(access_key, secret_key)
+        
+        # Probes are only re-run when credentials change or the cached results expire
+        credentials_hash = new_credentials_hash
         
         # Test credentials with STS
         logger.info(" Testing AWS credentials with STS...")
-        sts_client = session_aws.client('sts')
-        identity = sts_client.get_caller_identity()
-        logger.info(f" AWS credentials validated successfully!")
-        logger.info(f" Account: {identity.get('Account')}")
-        logger.info(f" User ARN: {identity.get('Arn')}")
+        identity = cached_probe(
+            'sts',
+            lambda: create_aws_client('sts').get_caller_identity()
+        )
+        logger.info(" AWS credentials validated successfully!")
+        logger.info(" Account: %s", identity.get('Account'))
+        logger.info(" User ARN: %s", identity.get('Arn'))
         
         # Create service clients
         logger.info("🛠️ Creating AWS service clients...")
-        s3_client = session_aws.client('s3')
-        bedrock_agent_runtime = session_aws.client('bedrock-agent-runtime')
-        bedrock_agent = session_aws.client('bedrock-agent')
+        s3_client = create_aws_client('s3')
+        bedrock_agent_runtime = create_aws_client('bedrock-agent-runtime')
+        bedrock_agent = create_aws_client('bedrock-agent')
         
-        # Test S3 access
-        logger.info(f"Testing S3 bucket access: {S3_BUCKET_NAME}")
-        try:
-            s3_client.head_bucket(Bucket=S3_BUCKET_NAME)
-            logger.info(" S3 bucket access confirmed")
-        except ClientError as e:
-            if e.response['Error']['Code'] == 'NoSuchBucket':
-                logger.warning(f" S3 bucket '{S3_BUCKET_NAME}' may not exist, but credentials are valid")
-            else:
-                logger.warning(f" S3 bucket access issue: {e.response['Error']['Code']}")
-        
-        # Test Bedrock access
-        logger.info(" Testing Bedrock agent access...")
-        try:
-            bedrock_agent.get_agent(agentId=BEDROCK_AGENT_ID)
-            logger.info(" Bedrock agent access confirmed")
-        except ClientError as e:
-            if e.response['Error']['Code'] == 'ResourceNotFoundException':
-                logger.warning(f" Bedrock agent '{BEDROCK_AGENT_ID}' may not exist, but credentials are valid")
-            else:
-                logger.warning(f" Bedrock access issue: {e.response['Error']['Code']}")
+        # Async session for the long-lived runtime client, rebuilt only on real reinitialization
+        if aioboto3 is not None:
+            aio_session = aioboto3.Session(
+                aws_access_key_id=access_key,
+                aws_secret_access_key=secret_key,
+                region_name=AWS_REGION
+            )
+        else:
+            logger.warning("aioboto3 not installed, falling back to synchronous boto3 for agent queries")
         
+        _clients_ready = True
         aws_connection_status = True
         connection_error_message = ""
         logger.info("All AWS clients initialized successfully!")
@@ -120,7 +240,7 @@ def initialize_aws_clients():
         else:
             error_msg = f"AWS Error ({error_code}): {error_message}"
         
-        logger.error(f"AWS ClientError: {error_msg}")
+        logger.error("AWS ClientError: %s", error_msg)
         connection_error_message = error_msg
         return False
         
@@ -136,19 +256,144 @@ def initialize_aws_clients():
         connection_error_message = error_msg
         return False
 
+class SessionRetryFailed(Exception):
+    """The agent still failed after rotating to a fresh session"""
+    
+    def __init__(self, session_id, error):
+        super().__init__(str(error))
+        self.session_id = session_id
+        self.error = error
+
+def is_context_window_error(error):
+    """Check whether a ClientError means the Bedrock session ran out of context"""
+    # Errors raised mid-stream are EventStreamErrors whose code is the stream
+    # member name ('validationException'), so compare case-insensitively
+    error_code = error.response['Error']['Code'].lower()
+    error_message = error.response['Error'].get('Message', '').lower()
+    return error_code == 'validationexception' and (
+        'context window' in error_message or 'memory turns' in error_message
+    )
+
+def bedrock_error_message(error):
+    """Turn an agent invocation error into the message shown to the user"""
+    if not isinstance(error, ClientError):
+        return f"I encountered an error while processing your cooking query: {str(error)}"
+    
+    error_code = error.response['Error']['Code']
+    error_message = error.response['Error'].get('Message', '')
+    if error_code == 'ResourceNotFoundException':
+        return f" Bedrock agent not found. Please verify agent ID: {BEDROCK_AGENT_ID}"
+    if error_code == 'AccessDeniedException':
+        return "Access denied to Bedrock agent. Check IAM permissions."
+    return f" Bedrock error: {error_message}"
+
+# Shown by /query and /query/stream when the agent returns nothing
+_NO_RESULT_MESSAGE = """🍳 I apologize, but I couldn't find specific information about that recipe or cooking technique in my knowledge base. 
+
+Here are some ways I can help you:
+- Ask about specific recipes (e.g., "How do I make chocolate chip cookies?")
+- Cooking techniques (e.g., "How to properly sauté vegetables?")
+- Ingredient substitutions (e.g., "What can I use instead of eggs in baking?")
+- Troubleshooting cooking problems
+
+Please try rephrasing your question or ask about a specific recipe or cooking technique!"""
+
+# Static recipe suggestions, sampled on every /suggestions hit
+_SUGGESTIONS = (
+    "Tell me something about south indian cuisine",
+    "What are the ingredients to make biriyani??",
+    "Tell me something about south indian cooking",
+    "Tell me something about jackfruit leather",
+    "What do you know about Pakistani/ Mughlai Cuisines??",
+    "What's a good vegetarian dinner recipe?",
+    "Can you tell me something about fundamentals of cooking",
+    "What are the cooking methods involved in arabian cuisine?",
+    "What are the ingredients required to make South Indian Dosa?",
+    "What are some healthy breakfast ideas?",
+    "How do I make pizza dough at home?",
+    "What's the secret to perfect scrambled eggs?"
+)
+
+async def _prepend_token(first_token, tokens):
+    """Re-attach a prefetched first token to the rest of a token stream"""
+    if first_token is not None:
+        yield first_token
+    async for token in tokens:
+        yield token
+
 class CookingRAGSystem:
     def __init__(self):
         self.session_id = None
     
     def check_aws_connection(self):
         """Check if AWS clients are properly initialized"""
-        if not aws_connection_status:
-            return False, connection_error_message or "AWS clients not initialized"
-        if not all([s3_client, bedrock_agent_runtime, bedrock_agent]):
-            return False, "AWS clients not properly configured"
-        return True, "AWS connection OK"
+        if _clients_ready:
+            return True, "AWS connection OK"
+        return False, connection_error_message or "AWS clients not initialized"
+    
+    async def _iter_completion(self, session_id, query):
+        """Invoke the Bedrock agent and yield events from its completion stream"""
+        client = bedrock_runtime_async
+        if client is not None:
+            # Shared client: its connection pool keeps TLS sessions alive across queries
+            response = await client.invoke_agent(
+                agentId=BEDROCK_AGENT_ID,
+                agentAliasId=BEDROCK_AGENT_ALIAS_ID,
+                sessionId=session_id,
+                inputText=query  # Send user query directly - agent instructions handle the rest
+            )
+            async for event in response['completion']:
+                yield event
+            return
+        
+        # boto3 fallback: run the blocking call and stream consumption off the event loop
+        def invoke_sync():
+            response = bedrock_agent_runtime.invoke_agent(
+                agentId=BEDROCK_AGENT_ID,
+                agentAliasId=BEDROCK_AGENT_ALIAS_ID,
+                sessionId=session_id,
+                inputText=query
+            )
+            return list(response['completion'])
+        
+        loop = asyncio.get_running_loop()
+        for event in await loop.run_in_executor(BEDROCK_EXECUTOR, invoke_sync):
+            yield event
+    
+    async def _invoke_and_collect(self, session_id, query):
+        """Invoke the Bedrock agent and return the full response text"""
+        buf = bytearray()
+        async for event in self._iter_completion(session_id, query):
+            if 'chunk' in event:
+                chunk = event['chunk']
+                if 'bytes' in chunk:
+                    buf.extend(chunk['bytes'])
+        # Decode once so multi-byte characters split across chunks stay intact
+        return buf.decode('utf-8')
+    
+    async def _run_with_session_retry(self, session_id, attempt):
+        """Run attempt(session_id), retrying once on a fresh session after context overflow
+        
+        Returns (result, session_id, new_session). Raises SessionRetryFailed if the
+        retry fails too, so callers can still move off the exhausted session.
+        """
+        try:
+            return await attempt(session_id), session_id, False
+        except ClientError as context_error:
+            if not is_context_window_error(context_error):
+                raise  # Re-raise if not context window issue
+            logger.warning("⚠️ Context window exceeded for session %.8s, creating new session...", session_id)
+        
+        # Create new session and retry
+        new_session_id = str(uuid.uuid4())
+        logger.info("🔄 Retrying with new session: %.8s...", new_session_id)
+        try:
+            return await attempt(new_session_id), new_session_id, True
+        except Exception as retry_error:
+            logger.error("Retry with new session failed: %s", retry_error)
+            raise SessionRetryFailed(new_session_id, retry_error) from retry_error
     
-    def query_cooking_agent(self, query, session_id=None):
+    async def query_cooking_agent(self, query, session_id=None):
         """Query the Bedrock agent for cooking-related questions"""
         try:
             # Check AWS connection first
@@ -163,219 +408,348 @@ class CookingRAGSystem:
             if not session_id:
                 session_id = str(uuid.uuid4())
             
-            logger.info(f"🍳 Processing cooking query with session: {session_id[:8]}...")
+            logger.info("🍳 Processing cooking query with session: %.8s...", session_id)
             
-            # First attempt with current session - send query directly
+            # Send query directly, rotating to a fresh session if the context is exhausted
             try:
-                response = bedrock_agent_runtime.invoke_agent(
-                    agentId=BEDROCK_AGENT_ID,
-                    agentAliasId=BEDROCK_AGENT_ALIAS_ID,
-                    sessionId=session_id,
-                    inputText=query  # Send user query directly - agent instructions handle the rest
+                result, session_id, new_session = await self._run_with_session_retry(
+                    session_id,
+                    lambda attempt_session_id: self._invoke_and_collect(attempt_session_id, query)
                 )
-                
-                # Process the streaming response
-                result = ""
-                for event in response['completion']:
-                    if 'chunk' in event:
-                        chunk = event['chunk']
-                        if 'bytes' in chunk:
-                            result += chunk['bytes'].decode('utf-8')
-                
-                if result.strip():
-                    logger.info("✅ Cooking agent query completed successfully")
-                    return {
-                        'response': result.strip(),
-                        'session_id': session_id,
-                        'success': True
-                    }
-                    
-            except ClientError as context_error:
-                if 'context window' in str(context_error).lower() or 'memory turns' in str(context_error).lower():
-                    logger.warning(f"⚠️ Context window exceeded for session {session_id[:8]}, creating new session...")
-                    
-                    # Create new session and retry
-                    new_session_id = str(uuid.uuid4())
-                    logger.info(f"🔄 Retrying with new session: {new_session_id[:8]}...")
-                    
-                    try:
-                        response = bedrock_agent_runtime.invoke_agent(
-                            agentId=BEDROCK_AGENT_ID,
-                            agentAliasId=BEDROCK_AGENT_ALIAS_ID,
-                            sessionId=new_session_id,
-                            inputText=query  # Send user query directly
-                        )
-                        
-                        # Process the streaming response
-                        result = ""
-                        for event in response['completion']:
-                            if 'chunk' in event:
-                                chunk = event['chunk']
-                                if 'bytes' in chunk:
-                                    result += chunk['bytes'].decode('utf-8')
-                        
-                        if result.strip():
-                            logger.info("✅ Cooking agent query completed with new session")
-                            return {
-                                'response': result.strip(),
-                                'session_id': new_session_id,
-                                'success': True,
-                                'new_session': True  # Flag to update frontend session
-                            }
-                    except Exception as retry_error:
-                        logger.error(f"Retry with new session failed: {str(retry_error)}")
-                        raise context_error  # Re-raise original error
-                else:
-                    raise context_error  # Re-raise if not context window issue
-            
-            # If no result from either attempt
-            result = """🍳 I apologize, but I couldn't find specific information about that recipe or cooking technique in my knowledge base. 
-
-Here are some ways I can help you:
-- Ask about specific recipes (e.g., "How do I make chocolate chip cookies?")
-- Cooking techniques (e.g., "How to properly sauté vegetables?")
-- Ingredient substitutions (e.g., "What can I use instead of eggs in baking?")
-- Troubleshooting cooking problems
-
-Please try rephrasing your question or ask about a specific recipe or cooking technique!"""
-            
-            return {
-                'response': result,
-                'session_id': session_id,
-                'success': True
-            }
-            
-        except ClientError as e:
-            error_code = e.response['Error']['Code']
-            error_message = e.response['Error'].get('Message', '')
-            
-            if error_code == 'ResourceNotFoundException':
-                response_msg = f" Bedrock agent not found. Please verify agent ID: {BEDROCK_AGENT_ID}"
-            elif error_code == 'AccessDeniedException':
-                response_msg = "Access denied to Bedrock agent. Check IAM permissions."
-            elif 'context window' in error_message.lower() or 'memory turns' in error_message.lower():
-                response_msg = "Conversation too long. Starting fresh session..."
-                # Return with new session flag
+            except SessionRetryFailed as e:
+                response_msg = bedrock_error_message(e.error)
+                logger.error("Cooking agent query error: %s", response_msg)
                 return {
                     'response': response_msg,
-                    'session_id': str(uuid.uuid4()),
-                    'success': True,
-                    'new_session': True
+                    'session_id': e.session_id,
+                    'success': False,
+                    'new_session': True  # Still move the cookie off the exhausted session
                 }
+            
+            if not result.strip():
+                # No result from the agent
+                result = _NO_RESULT_MESSAGE
+            elif new_session:
+                logger.info("✅ Cooking agent query completed with new session")
             else:
-                response_msg = f" Bedrock error: {error_message}"
+                logger.info("✅ Cooking agent query completed successfully")
             
-            logger.error(f"Cooking agent query error: {response_msg}")
-            return {
-                'response': response_msg,
+            response = {
+                'response': result.strip(),
                 'session_id': session_id,
-                'success': False
+                'success': True
             }
+            if new_session:
+                response['new_session'] = True  # Flag to update frontend session
+            return response
             
         except Exception as e:
-            logger.error(f"Error querying cooking agent: {str(e)}")
+            response_msg = bedrock_error_message(e)
+            logger.error("Cooking agent query error: %s", response_msg)
             return {
-                'response': f"I encountered an error while processing your cooking query: {str(e)}",
+                'response': response_msg,
                 'session_id': session_id,
                 'success': False
             }
 
+    async def stream_cooking_agent(self, query, session_id):
+        """Yield decoded text tokens from the Bedrock agent as they arrive"""
+        # Incremental decoder keeps multi-byte characters split across chunks intact
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        async for event in self._iter_completion(session_id, query):
+            if 'chunk' in event:
+                chunk = event['chunk']
+                if 'bytes' in chunk:
+                    token = decoder.decode(chunk['bytes'])
+                    if token:
+                        yield token
+        token = decoder.decode(b'', final=True)
+        if token:
+            yield token
+
+    async def open_cooking_stream(self, query, session_id):
+        """Start a streamed agent reply, rotating to a fresh session on context overflow
+        
+        The first token is awaited here so overflow surfaces before any response
+        headers go out. Returns (tokens, session_id, new_session).
+        """
+        async def attempt(attempt_session_id):
+            tokens = self.stream_cooking_agent(query, attempt_session_id)
+            try:
+                first_token = await tokens.__anext__()
+            except StopAsyncIteration:
+                first_token = None
+            return _prepend_token(first_token, tokens)
+        
+        return await self._run_with_session_retry(session_id, attempt)
+
     def get_recipe_suggestions(self):
         """Get sample recipe suggestions with variety"""
-        suggestions = [
-            "Tell me something about south indian cuisine",
-            "What are the ingredients to make biriyani??",
-            "Tell me something about south indian cooking",
-            "Tell me something about jackfruit leather",
-            "What do you know about Pakistani/ Mughlai Cuisines??",
-            "What's a good vegetarian dinner recipe?",
-            "Can you tell me something about fundamentals of cooking",
-            "What are the cooking methods involved in arabian cuisine?",
-            "What are the ingredients required to make South Indian Dosa?",
-            "What are some healthy breakfast ideas?",
-            "How do I make pizza dough at home?",
-            "What's the secret to perfect scrambled eggs?"
-        ]
         # Return random 8 suggestions each time for variety
-        import random
-        return random.sample(suggestions, 8)
+        return random.sample(_SUGGESTIONS, 8)
 
 # Initialize Cooking RAG system
 cooking_rag = CookingRAGSystem()
 
-# Try to initialize AWS clients on startup
-logger.info("Initializing AWS clients for CookingGenie...")
-aws_initialized = initialize_aws_clients()
+def ojsonify(obj, status=200):
+    """jsonify replacement for hot endpoints, encoding with orjson"""
+    return Response(orjson.dumps(obj), status=status, mimetype='application/json')
+
+_init_lock = threading.Lock()
+_last_init_failure = 0.0  # When initialization last failed; retries wait PREFLIGHT_TTL
+_init_scheduled = False  # A background initialization task is pending or running
+
+def _init_backing_off():
+    """True while the last failed initialization is younger than PREFLIGHT_TTL"""
+    return time() - _last_init_failure < PREFLIGHT_TTL
+
+def _get_clients(force=False):
+    """Initialize AWS clients on first use instead of at import time
+    
+    Only success sticks, but after a failure callers wait PREFLIGHT_TTL before trying
+    again so an AWS outage doesn't cost every request a round of timeouts. The lock keeps
+    concurrent first queries from racing on the globals and the shared botocore session.
+    """
+    global _last_init_failure
+    if _clients_ready and not force:
+        return True
+    if not force and _init_backing_off():
+        return False
+    with _init_lock:
+        if _clients_ready and not force:
+            return True  # Another thread finished initializing while we waited
+        if not force and _init_backing_off():
+            return False  # Another thread just failed while we waited
+        
+        logger.info("Initializing AWS clients for CookingGenie...")
+        aws_initialized = initialize_aws_clients()
+        _last_init_failure = 0.0 if aws_initialized else time()
+        
+        if not aws_initialized:
+            logger.warning("AWS clients failed to initialize. Application will run in limited mode.")
+            logger.warning("Error: %s", connection_error_message)
+        return aws_initialized
+
+def get_cooking_session_id():
+    """Return the sticky Bedrock session ID, starting a new one once it has gone idle"""
+    session_id = session.get('cooking_session_id')
+    now = time()
+    if not session_id or now - session.get('cooking_session_ts', 0) > COOKING_SESSION_TTL:
+        session_id = str(uuid.uuid4())
+        session['cooking_session_id'] = session_id
+    session['cooking_session_ts'] = now
+    return session_id
+
+async def open_async_runtime_client():
+    """Build the long-lived aioboto3 runtime client, rebuilding it only for a new session"""
+    global bedrock_runtime_async, _async_client_stack, _async_client_session, _async_client_lock
+    if aio_session is None or aio_session is _async_client_session:
+        return
+    if _async_client_lock is None:
+        _async_client_lock = asyncio.Lock()
+    
+    async with _async_client_lock:
+        if aio_session is None or aio_session is _async_client_session:
+            return  # Another request built it while we waited
+        await close_async_runtime_client()
+        
+        new_session = aio_session
+        stack = AsyncExitStack()
+        bedrock_runtime_async = await stack.enter_async_context(
+            new_session.client('bedrock-agent-runtime', config=aws_async_client_config)
+        )
+        _async_client_stack, _async_client_session = stack, new_session
+        logger.info("Async Bedrock runtime client ready")
+
+async def close_async_runtime_client():
+    """Close the long-lived aioboto3 runtime client and its connection pool"""
+    global bedrock_runtime_async, _async_client_stack, _async_client_session
+    stack = _async_client_stack
+    bedrock_runtime_async = _async_client_stack = _async_client_session = None
+    if stack is not None:
+        await stack.aclose()
+
+async def ensure_aws_clients():
+    """Make sure AWS clients exist without blocking the event loop"""
+    # Ready workers skip the executor instead of queueing behind blocking Bedrock calls
+    if not _clients_ready:
+        loop = asyncio.get_running_loop()
+        if not await loop.run_in_executor(BEDROCK_EXECUTOR, _get_clients):
+            return False
+    await open_async_runtime_client()
+    return True
+
+async def _initialize_in_background():
+    """Run ensure_aws_clients and clear the pending flag however it ends"""
+    global _init_scheduled
+    try:
+        await ensure_aws_clients()
+    finally:
+        _init_scheduled = False
+
+def schedule_aws_clients():
+    """Start AWS initialization as a background task unless one is already pending"""
+    global _init_scheduled
+    if _clients_ready or _init_scheduled:
+        return
+    _init_scheduled = True
+    app.add_background_task(_initialize_in_background)
+
+@app.before_serving
+async def start_aws_clients():
+    """Initialize AWS clients in the background as each worker starts serving"""
+    schedule_aws_clients()
 
-if not aws_initialized:
-    logger.warning("AWS clients failed to initialize. Application will run in limited mode.")
-    logger.warning(f"Error: {connection_error_message}")
+@app.after_serving
+async def stop_aws_clients():
+    """Release the async client's connections on shutdown"""
+    await close_async_runtime_client()
 
 @app.route('/')
-def index():
+async def index():
     """Main page with cooking chat interface"""
-    return render_template('index.html')
+    return await render_template('index.html')
 
 @app.route('/query', methods=['POST'])
-def query_cooking():
+async def query_cooking():
     """Handle cooking-related queries"""
     try:
-        # Check if AWS is connected first
-        if not aws_connection_status:
-            return jsonify({
+        # Check if AWS is connected first (initializes clients on the first query)
+        if not await ensure_aws_clients():
+            return ojsonify({
                 'success': False, 
                 'message': f'Cannot process cooking query: {connection_error_message}'
             })
         
-        data = request.get_json()
+        data = await request.get_json()
         query_text = data.get('query', '').strip()
         
         if not query_text:
-            return jsonify({'success': False, 'message': '🍳 Please ask me a cooking question!'})
+            return ojsonify({'success': False, 'message': '🍳 Please ask me a cooking question!'})
         
-        logger.info(f"🍳 Processing cooking query: {query_text[:50]}...")
+        logger.info("🍳 Processing cooking query: %.50s...", query_text)
         
         # Get or create session ID
-        session_id = session.get('cooking_session_id')
-        if not session_id:
-            session_id = str(uuid.uuid4())
-            session['cooking_session_id'] = session_id
+        session_id = get_cooking_session_id()
         
         # Query the cooking agent
-        result = cooking_rag.query_cooking_agent(query_text, session_id)
+        result = await cooking_rag.query_cooking_agent(query_text, session_id)
         
         # Check if we got a new session due to context window limits
         if result.get('new_session', False):
             session['cooking_session_id'] = result['session_id']
-            logger.info(f" Updated session ID to: {result['session_id'][:8]}...")
+            logger.info(" Updated session ID to: %.8s...", result['session_id'])
         
         if result['success']:
             logger.info("Cooking query processed successfully")
         else:
-            logger.warning(f" Cooking query processing had issues: {result['response']}")
+            logger.warning(" Cooking query processing had issues: %s", result['response'])
         
-        return jsonify(result)
+        return ojsonify(result)
         
     except Exception as e:
-        logger.error(f"Cooking query error: {str(e)}")
-        return jsonify({'success': False, 'message': f'🚨 Cooking query failed: {str(e)}'})
+        logger.error("Cooking query error: %s", e)
+        return ojsonify({'success': False, 'message': f'🚨 Cooking query failed: {str(e)}'})
+
+@app.route('/query/stream', methods=['POST'])
+async def query_cooking_stream():
+    """Stream cooking query responses as server-sent events"""
+    try:
+        # Check if AWS is connected first (initializes clients on the first query)
+        if not await ensure_aws_clients():
+            return ojsonify({
+                'success': False, 
+                'message': f'Cannot process cooking query: {connection_error_message}'
+            })
+        
+        data = await request.get_json()
+        query_text = data.get('query', '').strip()
+        
+        if not query_text:
+            return ojsonify({'success': False, 'message': '🍳 Please ask me a cooking question!'})
+        
+        logger.info("🍳 Streaming cooking query: %.50s...", query_text)
+        
+        session_id = get_cooking_session_id()
+        
+        # Start the stream here so context overflow is retried on a new session
+        # while the session cookie can still be updated
+        tokens, new_session, error_msg = None, False, None
+        try:
+            tokens, session_id, new_session = await cooking_rag.open_cooking_stream(query_text, session_id)
+        except SessionRetryFailed as e:
+            session_id, new_session = e.session_id, True
+            error_msg = bedrock_error_message(e.error)
+        except Exception as e:
+            error_msg = bedrock_error_message(e)
+        
+        # Session must be settled before the response headers go out
+        if new_session:
+            session['cooking_session_id'] = session_id
+            logger.info(" Updated session ID to: %.8s...", session_id)
+        
+    except Exception as e:
+        logger.error("Cooking query error: %s", e)
+        return ojsonify({'success': False, 'message': f'🚨 Cooking query failed: {str(e)}'})
+    
+    async def generate():
+        failure, answered = error_msg, False
+        if tokens is not None:
+            try:
+                async for token in tokens:
+                    answered = answered or bool(token.strip())
+                    yield b'data: ' + orjson.dumps({'token': token}) + b'\n\n'
+            except Exception as e:
+                failure = bedrock_error_message(e)
+        if not failure and not answered:
+            # Same fallback as /query when the agent returns nothing
+            yield b'data: ' + orjson.dumps({'token': _NO_RESULT_MESSAGE}) + b'\n\n'
+        if failure:
+            logger.error("Cooking stream error: %s", failure)
+            yield b'data: ' + orjson.dumps({'error': failure}) + b'\n\n'
+        
+        done = {'done': True}
+        if new_session:
+            done.update({'new_session': True, 'session_id': session_id})
+        yield b'data: ' + orjson.dumps(done) + b'\n\n'
+    
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 @app.route('/suggestions')
-def get_suggestions():
+async def get_suggestions():
     """Get cooking recipe suggestions"""
     try:
         suggestions = cooking_rag.get_recipe_suggestions()
-        return jsonify({'success': True, 'suggestions': suggestions})
+        response = ojsonify({'success': True, 'suggestions': suggestions})
+        # Short cache lifetime absorbs repeated opens without freezing the variety
+        response.headers['Cache-Control'] = 'max-age=1'
+        return response
     except Exception as e:
-        logger.error(f"Error getting suggestions: {str(e)}")
-        return jsonify({'success': False, 'suggestions': []})
+        logger.error("Error getting suggestions: %s", e)
+        return ojsonify({'success': False, 'suggestions': []})
 
 @app.route('/health')
-def health_check():
+async def health_check():
     """Health check endpoint with detailed AWS status"""
     try:
+        # Never wait on AWS here: a worker that isn't ready yet starts (or keeps)
+        # initializing in the background and reports where it stands
+        if not _clients_ready:
+            schedule_aws_clients()
+        
+        if aws_connection_status:
+            overall = 'healthy'
+        elif connection_error_message or _init_backing_off():
+            overall = 'degraded'
+        else:
+            overall = 'initializing'
+        
         status = {
-            'status': 'healthy' if aws_connection_status else 'degraded',
+            'status': overall,
             'service': 'CookingGenie RAG System',
             'timestamp': datetime.now().isoformat(),
             'aws_connected': aws_connection_status,
@@ -384,48 +758,71 @@ def health_check():
         }
         
         if aws_connection_status:
-            # Test each service
-            try:
-                s3_client.head_bucket(Bucket=S3_BUCKET_NAME)
-                status['services']['s3'] = 'connected'
-            except Exception as e:
-                status['services']['s3'] = f'error: {str(e)}'
+            # Test each service (cached so health-check polling stays off the network)
+            s3_error = await cached_probe_async('s3', probe_s3_bucket)
+            status['services']['s3'] = 'connected' if s3_error is None else f'error: {s3_error}'
             
-            status['services']['bedrock_agent'] = 'available' if bedrock_agent else '❌ not_initialized'
+            bedrock_error = await cached_probe_async('bedrock_agent', probe_bedrock_agent)
+            status['services']['bedrock_agent'] = 'available' if bedrock_error is None else f'error: {bedrock_error}'
             status['services']['bedrock_runtime'] = 'available' if bedrock_agent_runtime else '❌ not_initialized'
             status['bucket_name'] = S3_BUCKET_NAME
             status['agent_id'] = BEDROCK_AGENT_ID
             status['knowledge_base_id'] = KNOWLEDGE_BASE_ID
         else:
-            status['error'] = connection_error_message
+            status['error'] = connection_error_message or 'AWS clients not initialized yet'
             status['services'] = {'s3': 'disconnected', 'bedrock': 'disconnected'}
         
-        return jsonify(status)
+        return ojsonify(status)
         
     except Exception as e:
-        return jsonify({
+        return ojsonify({
             'status': 'unhealthy', 
             'service': 'CookingGenie RAG System',
             'error': str(e),
             'timestamp': datetime.now().isoformat()
-        }), 500
+        }, 500)
 
 @app.route('/reinitialize-aws', methods=['POST'])
-def reinitialize_aws():
-    """Endpoint to retry AWS initialization"""
-    global aws_connection_status, connection_error_message
+async def reinitialize_aws():
+    """Endpoint to retry AWS initialization
     
+    Credentials are re-read from the environment; if they are unchanged and the
+    connection is live, the existing clients are kept instead of being rebuilt.
+    """
     logger.info("Attempting to reinitialize AWS clients...")
-    success = initialize_aws_clients()
-    
+    loop = asyncio.get_running_loop()
+    success = await loop.run_in_executor(BEDROCK_EXECUTOR, functools.partial(_get_clients, force=True))
     if success:
+        await open_async_runtime_client()
         return jsonify({'success': True, 'message': 'AWS clients reinitialized successfully'})
     else:
         return jsonify({'success': False, 'message': connection_error_message})
 
+@app.after_request
+async def compress_response(response):
+    """Compress JSON responses with Brotli or gzip; SSE streams are left untouched"""
+    if response.mimetype not in COMPRESS_MIMETYPES or 'Content-Encoding' in response.headers:
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    encoding = request.accept_encodings.best_match(['br', 'gzip'] if brotli is not None else ['gzip'])
+    if not encoding:
+        return response
+    
+    data = await response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+    
+    if encoding == 'br':
+        response.set_data(brotli.compress(data, quality=5))
+    else:
+        response.set_data(gzip.compress(data, compresslevel=6))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
 @app.errorhandler(500)
 def internal_error(e):
-    logger.error(f"Internal server error: {str(e)}")
+    logger.error("Internal server error: %s", e)
     return jsonify({'success': False, 'message': 'Internal server error'}), 500
 
 @app.errorhandler(404)
@@ -433,6 +830,22 @@ def not_found(e):
     return jsonify({'success': False, 'message': 'Endpoint not found'}), 404
 
 if __name__ == '__main__':
+    port = int(os.getenv('PORT', 5000))
+    
+    # Production must not use app.run: hand the process to gunicorn with uvicorn
+    # workers (the app is ASGI). --preload imports main once and forks ready workers;
+    # the uvicorn worker runs on uvloop whenever it is installed. Running gunicorn
+    # through this interpreter keeps it in the same virtualenv as the app.
+    if os.getenv('PROD') == '1':
+        workers = os.getenv('WEB_CONCURRENCY', '2')
+        os.execv(sys.executable, [
+            sys.executable, '-m', 'gunicorn', '-k', 'uvicorn_worker.UvicornWorker', '-w', workers,
+            '--preload', f'--bind=0.0.0.0:{port}', 'main:app'
+        ])
+    
+    # Initialize eagerly for the dev server so the startup status is accurate
+    _get_clients()
+    
     # Print startup status
     print("\n" + "="*60)
     print("CookingGenie RAG Assistant Starting...")
@@ -446,8 +859,7 @@ if __name__ == '__main__':
         print(f"Knowledge Base: {KNOWLEDGE_BASE_ID}")
     print("="*60 + "\n")
     
-    # Run the application
+    # Run the development server
     debug_mode = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
-    port = int(os.getenv('PORT', 5000))
     
     app.run(debug=debug_mode, host='0.0.0.0', port=port)
\ No newline at end of file
@@ -0,0 +1,465 @@
+import asyncio
+import gzip
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import orjson
+import pytest
+from botocore.exceptions import EventStreamError
+
+import main
+
+
+def stream_error(message):
+    """Error as raised while iterating an InvokeAgent completion stream"""
+    return EventStreamError(
+        {'Error': {'Code': 'validationException', 'Message': message}},
+        'InvokeAgent'
+    )
+
+
+def fake_completion(calls, failing_sessions):
+    """Stand-in for _iter_completion that fails mid-stream for the given sessions"""
+    async def _iter_completion(session_id, query):
+        calls.append(session_id)
+        if failing_sessions is None or session_id in failing_sessions:
+            raise stream_error("Input exceeds the agent's context window")
+        yield {'chunk': {'bytes': 'Soak the rice overnight 🍚'.encode('utf-8')}}
+    return _iter_completion
+
+
+@pytest.fixture
+def cooking_rag(monkeypatch):
+    monkeypatch.setattr(main, '_clients_ready', True)
+    return main.CookingRAGSystem()
+
+
+def test_context_window_error_matches_stream_error_code():
+    assert main.is_context_window_error(stream_error("Input exceeds the context window"))
+    assert not main.is_context_window_error(stream_error("Invalid agent alias"))
+
+
+def test_stream_overflow_retries_on_new_session(cooking_rag, monkeypatch):
+    calls = []
+    monkeypatch.setattr(cooking_rag, '_iter_completion', fake_completion(calls, {'exhausted'}))
+
+    result = asyncio.run(cooking_rag.query_cooking_agent('How do I make dosa?', 'exhausted'))
+
+    assert result['success']
+    assert result['new_session']
+    assert result['response'] == 'Soak the rice overnight 🍚'
+    assert calls == ['exhausted', result['session_id']]
+
+
+def test_failed_retry_still_moves_off_exhausted_session(cooking_rag, monkeypatch):
+    calls = []
+    monkeypatch.setattr(cooking_rag, '_iter_completion', fake_completion(calls, None))
+
+    result = asyncio.run(cooking_rag.query_cooking_agent('How do I make dosa?', 'exhausted'))
+
+    assert not result['success']
+    assert result['new_session']
+    assert result['session_id'] != 'exhausted'
+    assert calls == ['exhausted', result['session_id']]
+
+
+def test_other_validation_errors_keep_session(cooking_rag, monkeypatch):
+    calls = []
+
+    async def _iter_completion(session_id, query):
+        calls.append(session_id)
+        raise stream_error("Invalid agent alias")
+        yield
+
+    monkeypatch.setattr(cooking_rag, '_iter_completion', _iter_completion)
+
+    result = asyncio.run(cooking_rag.query_cooking_agent('How do I make dosa?', 'current'))
+
+    assert not result['success']
+    assert 'new_session' not in result
+    assert result['session_id'] == 'current'
+    assert calls == ['current']
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def ensure_aws_clients():
+        return True
+
+    monkeypatch.setattr(main, 'ensure_aws_clients', ensure_aws_clients)
+    monkeypatch.setattr(main, '_clients_ready', True)
+    return main.app.test_client()
+
+
+def test_stream_overflow_rotates_session_cookie(client, monkeypatch):
+    calls = []
+
+    async def _iter_completion(session_id, query):
+        calls.append(session_id)
+        if len(calls) == 1:
+            raise stream_error("Input exceeds the agent's context window")
+        yield {'chunk': {'bytes': 'Soak the rice overnight 🍚'.encode('utf-8')}}
+
+    monkeypatch.setattr(main.cooking_rag, '_iter_completion', _iter_completion)
+
+    async def run():
+        first = await client.post('/query/stream', json={'query': 'How do I make dosa?'})
+        first_body = await first.get_data(as_text=True)
+        second = await client.post('/query/stream', json={'query': 'And the chutney?'})
+        second_body = await second.get_data(as_text=True)
+        return first_body, second_body
+
+    first_body, second_body = asyncio.run(run())
+
+    assert 'Soak the rice overnight' in first_body
+    assert '"new_session":true' in first_body
+    assert 'error' not in second_body
+    # Retry session is sticky: the exhausted one is never used again
+    assert calls[1] != calls[0]
+    assert calls[2] == calls[1]
+
+
+def sse_events(body):
+    """Decode the JSON payloads of a server-sent event stream"""
+    return [orjson.loads(line[len('data: '):]) for line in body.splitlines() if line.startswith('data: ')]
+
+
+def test_empty_stream_sends_no_result_fallback(client, monkeypatch):
+    async def _iter_completion(session_id, query):
+        for _ in ():
+            yield _
+
+    monkeypatch.setattr(main.cooking_rag, '_iter_completion', _iter_completion)
+
+    async def run():
+        response = await client.post('/query/stream', json={'query': 'How do I make dosa?'})
+        return await response.get_data(as_text=True)
+
+    events = sse_events(asyncio.run(run()))
+
+    assert events == [{'token': main._NO_RESULT_MESSAGE}, {'done': True}]
+
+
+def test_stream_rejects_non_json_body(client):
+    async def run():
+        response = await client.post('/query/stream', data='not json')
+        return response.status_code, await response.get_json()
+
+    status_code, body = asyncio.run(run())
+
+    assert status_code == 200
+    assert body['success'] is False
+
+
+def test_concurrent_first_queries_initialize_once(monkeypatch):
+    monkeypatch.setattr(main, '_clients_ready', False)
+    calls = []
+
+    def initialize_aws_clients():
+        calls.append(1)
+        time.sleep(0.05)
+        main._clients_ready = True
+        return True
+
+    monkeypatch.setattr(main, 'initialize_aws_clients', initialize_aws_clients)
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        results = list(pool.map(lambda _: main._get_clients(), range(5)))
+
+    assert results == [True] * 5
+    assert len(calls) == 1
+
+
+def test_failed_initialization_is_retried_after_backoff(monkeypatch):
+    monkeypatch.setattr(main, '_clients_ready', False)
+    monkeypatch.setattr(main, '_last_init_failure', 0.0)
+    outcomes = [False, True]
+
+    def initialize_aws_clients():
+        ok = outcomes.pop(0)
+        main._clients_ready = ok
+        return ok
+
+    monkeypatch.setattr(main, 'initialize_aws_clients', initialize_aws_clients)
+
+    assert main._get_clients() is False
+    assert main._get_clients() is False  # Still backing off, AWS isn't asked again
+    assert outcomes == [True]
+
+    main._last_init_failure -= main.PREFLIGHT_TTL
+    assert main._get_clients() is True
+    assert outcomes == []
+    assert main._last_init_failure == 0.0
+
+
+class FakeAioSession:
+    """Counts runtime clients opened and closed through aioboto3's client factory"""
+
+    def __init__(self):
+        self.opened = 0
+        self.closed = 0
+
+    def client(self, service_name, config=None):
+        session = self
+
+        class _Client:
+            async def __aenter__(self):
+                session.opened += 1
+                return self
+
+            async def __aexit__(self, *exc_info):
+                session.closed += 1
+
+        return _Client()
+
+
+def test_async_runtime_client_is_reused_until_session_changes(monkeypatch):
+    monkeypatch.setattr(main, '_clients_ready', True)
+    first, second = FakeAioSession(), FakeAioSession()
+
+    async def run():
+        main.aio_session = first
+        await main.ensure_aws_clients()
+        client = main.bedrock_runtime_async
+        await main.ensure_aws_clients()
+        assert main.bedrock_runtime_async is client
+
+        main.aio_session = second
+        await main.ensure_aws_clients()
+        await main.close_async_runtime_client()
+
+    monkeypatch.setattr(main, 'aio_session', None)
+    monkeypatch.setattr(main, '_async_client_lock', None)
+    asyncio.run(run())
+
+    assert (first.opened, first.closed) == (1, 1)
+    assert (second.opened, second.closed) == (1, 1)
+    assert main.bedrock_runtime_async is None
+
+
+def test_health_schedules_init_without_waiting(monkeypatch):
+    monkeypatch.setattr(main, '_clients_ready', False)
+    monkeypatch.setattr(main, 'aws_connection_status', False)
+    monkeypatch.setattr(main, 'connection_error_message', '')
+    monkeypatch.setattr(main, '_last_init_failure', 0.0)
+    monkeypatch.setattr(main, '_init_scheduled', False)
+    scheduled = []
+    monkeypatch.setattr(main.app, 'add_background_task', scheduled.append)
+
+    def initialize_aws_clients():
+        raise AssertionError('/health must not initialize inline')
+
+    monkeypatch.setattr(main, 'initialize_aws_clients', initialize_aws_clients)
+
+    async def run():
+        client = main.app.test_client()
+        first = await (await client.get('/health')).get_json()
+        second = await (await client.get('/health')).get_json()
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert first['status'] == second['status'] == 'initializing'
+    assert scheduled == [main._initialize_in_background]  # Pending task isn't duplicated
+
+
+def test_health_reports_degraded_while_backing_off(monkeypatch):
+    monkeypatch.setattr(main, '_clients_ready', False)
+    monkeypatch.setattr(main, 'aws_connection_status', False)
+    monkeypatch.setattr(main, 'connection_error_message', 'boom')
+    monkeypatch.setattr(main, '_last_init_failure', main.time())
+    monkeypatch.setattr(main, '_init_scheduled', False)
+    calls = []
+
+    def initialize_aws_clients():
+        calls.append(1)
+        return False
+
+    monkeypatch.setattr(main, 'initialize_aws_clients', initialize_aws_clients)
+
+    async def run():
+        client = main.app.test_client()
+        status = await (await client.get('/health')).get_json()
+        await main._initialize_in_background()  # What the scheduled task would run
+        return status
+
+    status = asyncio.run(run())
+
+    assert status['status'] == 'degraded'
+    assert status['error'] == 'boom'
+    assert calls == []
+
+
+class FakeClock:
+    """Stands in for main.time so probe TTLs can expire without sleeping"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def counting_probe(calls, name, result=None):
+    def probe():
+        calls.append(name)
+        return result
+    return probe
+
+
+def test_cached_probe_expires_after_ttl(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(main, 'time', clock)
+    monkeypatch.setattr(main, '_preflight_cache', {})
+    monkeypatch.setattr(main, 'credentials_hash', 'a')
+    calls = []
+    probe = counting_probe(calls, 's3', 'AccessDenied')
+
+    assert main.cached_probe('s3', probe) == 'AccessDenied'
+    clock.now += main.PREFLIGHT_TTL - 1
+    assert main.cached_probe('s3', probe) == 'AccessDenied'
+    assert main._fresh_probe(('s3', 'a')) is not None
+    assert calls == ['s3']
+
+    clock.now += 1
+    assert main._fresh_probe(('s3', 'a')) is None
+    main.cached_probe('s3', probe)
+    assert calls == ['s3', 's3']
+
+
+def test_cached_probe_is_keyed_by_credentials(monkeypatch):
+    monkeypatch.setattr(main, '_preflight_cache', {})
+    monkeypatch.setattr(main, 'credentials_hash', 'a')
+    calls = []
+    old, new = counting_probe(calls, 'old', 'InvalidClientTokenId'), counting_probe(calls, 'new')
+
+    assert main.cached_probe('sts', old) == 'InvalidClientTokenId'
+    monkeypatch.setattr(main, 'credentials_hash', 'b')
+    assert main.cached_probe('sts', new) is None  # New credentials never see the old result
+    monkeypatch.setattr(main, 'credentials_hash', 'a')
+    assert main.cached_probe('sts', old) == 'InvalidClientTokenId'
+
+    assert calls == ['old', 'new']
+
+
+def test_repeat_health_within_ttl_stays_off_aws(monkeypatch):
+    monkeypatch.setattr(main, '_clients_ready', True)
+    monkeypatch.setattr(main, 'aws_connection_status', True)
+    monkeypatch.setattr(main, '_preflight_cache', {})
+    calls = []
+    monkeypatch.setattr(main, 'probe_s3_bucket', counting_probe(calls, 's3'))
+    monkeypatch.setattr(main, 'probe_bedrock_agent', counting_probe(calls, 'bedrock_agent'))
+
+    def initialize_aws_clients():
+        calls.append('init')
+        return True
+
+    monkeypatch.setattr(main, 'initialize_aws_clients', initialize_aws_clients)
+
+    async def run():
+        client = main.app.test_client()
+        first = await (await client.get('/health')).get_json()
+        second = await (await client.get('/health')).get_json()
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert first['status'] == second['status'] == 'healthy'
+    assert second['services']['s3'] == 'connected'
+    assert calls == ['s3', 'bedrock_agent']  # Only the first request probed
+
+
+def test_reinitialize_reuses_clients_until_credentials_change(monkeypatch):
+    for name in ('_clients_ready', 'aws_connection_status'):
+        monkeypatch.setattr(main, name, False)
+    for name in ('credentials_hash', 's3_client', 'bedrock_agent_runtime', 'bedrock_agent', 'aio_session', 'aioboto3'):
+        monkeypatch.setattr(main, name, None)
+    for name in ('AWS_REGION', 'AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY', 'connection_error_message'):
+        monkeypatch.setattr(main, name, getattr(main, name))
+    monkeypatch.setattr(main, '_preflight_cache', {})
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'AKIAEXAMPLE')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'secret-one')
+    created, credentials = [], []
+
+    class FakeClient:
+        def get_caller_identity(self):
+            return {'Account': '123456789012', 'Arn': 'arn:aws:iam::123456789012:user/test'}
+
+    def create_aws_client(service_name):
+        created.append(service_name)
+        return FakeClient()
+
+    monkeypatch.setattr(main, 'create_aws_client', create_aws_client)
+    monkeypatch.setattr(main.botocore_session, 'set_credentials', lambda *keys: credentials.append(keys))
+
+    assert main._get_clients(force=True) is True
+    assert created == ['sts', 's3', 'bedrock-agent-runtime', 'bedrock-agent']
+    clients = main.s3_client
+
+    # What /reinitialize-aws does after a success: same credentials, nothing rebuilt
+    assert main._get_clients(force=True) is True
+    assert len(created) == 4 and len(credentials) == 1
+    assert main.s3_client is clients
+
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'secret-two')
+    assert main._get_clients(force=True) is True
+    assert credentials[-1] == ('AKIAEXAMPLE', 'secret-two')
+    assert created[4:] == ['sts', 's3', 'bedrock-agent-runtime', 'bedrock-agent']
+    assert main.s3_client is not clients
+
+
+def compress(body, accept_encoding=None, mimetype='application/json'):
+    """Run compress_response on a response as if it answered a request with that Accept-Encoding"""
+    headers = {'Accept-Encoding': accept_encoding} if accept_encoding is not None else {}
+
+    async def run():
+        async with main.app.test_request_context('/', headers=headers):
+            response = main.Response(body, mimetype=mimetype)
+            response = await main.compress_response(response)
+            return response, await response.get_data()
+
+    return asyncio.run(run())
+
+
+LARGE_JSON = orjson.dumps({'suggestions': ['Pasta carbonara'] * 100})
+
+
+@pytest.mark.parametrize('accept_encoding', ['gzip', '*', 'gzip, deflate'])
+def test_large_json_is_gzipped(monkeypatch, accept_encoding):
+    monkeypatch.setattr(main, 'brotli', None)
+    response, data = compress(LARGE_JSON, accept_encoding)
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert gzip.decompress(data) == LARGE_JSON
+
+
+@pytest.mark.parametrize('accept_encoding', ['identity', None])
+def test_json_stays_uncompressed_without_gzip_support(monkeypatch, accept_encoding):
+    monkeypatch.setattr(main, 'brotli', None)
+    response, data = compress(LARGE_JSON, accept_encoding)
+
+    assert 'Content-Encoding' not in response.headers
+    assert data == LARGE_JSON
+
+
+def test_small_json_is_not_compressed(monkeypatch):
+    monkeypatch.setattr(main, 'brotli', None)
+    body = orjson.dumps({'success': True})
+    assert len(body) < main.COMPRESS_MIN_SIZE
+
+    response, data = compress(body, 'gzip')
+
+    assert 'Content-Encoding' not in response.headers
+    assert data == body
+
+
+def test_event_stream_passes_through(monkeypatch):
+    monkeypatch.setattr(main, 'brotli', None)
+    body = b'data: ' + LARGE_JSON + b'\n\n'
+
+    response, data = compress(body, 'gzip', mimetype='text/event-stream')
+
+    assert 'Content-Encoding' not in response.headers
+    assert 'Vary' not in response.headers
+    assert data == body